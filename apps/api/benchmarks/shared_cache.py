@@ -0,0 +1,113 @@
+"""
+Compare cache hit rate and lookup latency with 1 vs N worker processes.
+
+Each worker serves requests for a skewed set of users, as if behind a load
+balancer. A miss sleeps for ``--miss-cost`` ms to stand in for the database
+queries it would have run. Run from apps/api:
+
+    python -m benchmarks.shared_cache --workers 4
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from multiprocessing import Pool
+
+from services import LRUCache, SharedCache
+
+
+class BenchCache(LRUCache):
+    """Shares every value as JSON, like the app's response payloads."""
+
+    def _encode(self, key, value) -> bytes:
+        return json.dumps(value).encode()
+
+    def _decode(self, key, data: bytes):
+        return json.loads(data)
+
+
+def run_worker(args: tuple) -> tuple[int, int, list[float]]:
+    seed, requests, users, local_size, miss_cost, shared_path = args
+    rng = random.Random(seed)
+    cache = BenchCache(local_size, namespace="bench")
+    if shared_path:
+        cache.shared = SharedCache(shared_path)
+
+    # Zipf-like popularity: a few users poll far more often than the rest.
+    weights = [1 / (rank + 1) for rank in range(users)]
+    keys = rng.choices(range(users), weights=weights, k=requests)
+
+    hits = 0
+    latencies = []
+    for key in keys:
+        start = time.perf_counter()
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            time.sleep(miss_cost / 1000)
+            cache.set(key, {"user": key, "payload": "x" * 512})
+        latencies.append(time.perf_counter() - start)
+    return hits, requests, latencies
+
+
+def run(workers: int, shared: bool, options) -> dict:
+    shared_path = None
+    if shared:
+        directory = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        shared_path = tempfile.mkdtemp(dir=directory)
+
+    jobs = [
+        (
+            seed,
+            options.requests // workers,
+            options.users,
+            options.local_size,
+            options.miss_cost,
+            shared_path,
+        )
+        for seed in range(workers)
+    ]
+    try:
+        with Pool(workers) as pool:
+            results = pool.map(run_worker, jobs)
+    finally:
+        if shared_path:
+            shutil.rmtree(shared_path)
+
+    hits = sum(result[0] for result in results)
+    total = sum(result[1] for result in results)
+    latencies = sorted(latency for result in results for latency in result[2])
+    return {
+        "hit_rate": hits / total * 100,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--local-size", type=int, default=256)
+    parser.add_argument("--miss-cost", type=float, default=2.0, help="ms per miss")
+    options = parser.parse_args()
+
+    print(f"{'workers':>7} {'tier':>12} {'hit rate':>9} {'mean ms':>8} {'p99 ms':>7}")
+    for workers in sorted({1, options.workers}):
+        for shared in (False, True):
+            result = run(workers, shared, options)
+            tier = "local+shared" if shared else "local"
+            print(
+                f"{workers:>7} {tier:>12} {result['hit_rate']:>8.1f}% "
+                f"{result['mean_ms']:>8.3f} {result['p99_ms']:>7.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
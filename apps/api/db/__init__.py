@@ -1,4 +1,14 @@
-from db.connection import db
+from db.breaker import CircuitBreaker
+from db.connection import DatabaseUnavailable, db
+from db.instrumentation import QueryLog, QueryRecord
 from db.schema import create_tables, drop_tables
 
-__all__ = ["db", "create_tables", "drop_tables"]
+__all__ = [
+    "CircuitBreaker",
+    "DatabaseUnavailable",
+    "QueryLog",
+    "QueryRecord",
+    "db",
+    "create_tables",
+    "drop_tables",
+]
@@ -1,19 +1,68 @@
-from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncGenerator, Iterator
 
 import asyncpg
 
+from db.breaker import CircuitBreaker
+from db.instrumentation import InstrumentedConnection, QueryLog, current_query_log
+
+# Errors from checking out a connection that mean the database itself is
+# unreachable or overloaded.
+ACQUIRE_ERRORS = (
+    TimeoutError,
+    OSError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.CannotConnectNowError,
+    asyncpg.TooManyConnectionsError,
+)
+
+# Errors raised while the connection is held that mean the same, or that a
+# query ran past statement_timeout. The handler runs inside acquire(), so
+# bare OSError/TimeoutError are not counted here: they may come from
+# anything else the handler does.
+QUERY_ERRORS = (
+    asyncpg.PostgresConnectionError,
+    asyncpg.CannotConnectNowError,
+    asyncpg.TooManyConnectionsError,
+    asyncpg.QueryCanceledError,
+)
+
+
+class DatabaseUnavailable(Exception):
+    """Raised instead of waiting when the database can't serve a request."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Database not available")
+        self.retry_after = retry_after
+
 
 class Database:
     def __init__(self):
         self.pool: asyncpg.Pool | None = None
+        self.acquire_timeout: float | None = None
+        self.breaker = CircuitBreaker()
 
-    async def connect(self, database_url: str):
+    async def connect(
+        self,
+        database_url: str,
+        acquire_timeout: float | None = None,
+        failure_threshold: int = 5,
+        reset_timeout: float = 10.0,
+        statement_timeout: float | None = None,
+    ):
         """Create connection pool."""
+        self.acquire_timeout = acquire_timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        server_settings = {}
+        if statement_timeout:
+            # Enforced by the server, so a slow query fails with
+            # QueryCanceledError rather than a bare TimeoutError
+            server_settings["statement_timeout"] = str(int(statement_timeout * 1000))
         self.pool = await asyncpg.create_pool(
             database_url,
             min_size=2,
             max_size=10,
+            server_settings=server_settings,
         )
 
     async def disconnect(self):
@@ -24,11 +73,58 @@ class Database:
 
     @asynccontextmanager
     async def acquire(self) -> AsyncGenerator[asyncpg.Connection, None]:
-        """Acquire a connection from the pool."""
+        """
+        Acquire a connection from the pool.
+
+        Waits at most ``acquire_timeout`` seconds for a free connection and
+        raises DatabaseUnavailable while the circuit breaker is open, or when
+        acquiring or a query fails because the database is unreachable or
+        too slow (see ACQUIRE_ERRORS and QUERY_ERRORS).
+        """
         if not self.pool:
             raise RuntimeError("Database not connected")
-        async with self.pool.acquire() as connection:
-            yield connection
+        if not self.breaker.allow_request():
+            raise DatabaseUnavailable(self.breaker.retry_after())
+
+        acquired = False
+        try:
+            async with self.pool.acquire(timeout=self.acquire_timeout) as connection:
+                acquired = True
+                query_log = current_query_log.get()
+                if query_log is not None:
+                    connection = InstrumentedConnection(
+                        connection, query_log.start_session()
+                    )
+                yield connection
+        except BaseException as e:
+            if isinstance(e, QUERY_ERRORS if acquired else ACQUIRE_ERRORS):
+                self.breaker.record_failure()
+                raise DatabaseUnavailable(self.breaker.retry_after()) from e
+            if acquired:
+                self.breaker.record_success()
+            else:
+                self.breaker.release_probe()
+            raise
+        else:
+            self.breaker.record_success()
+
+    @contextmanager
+    def track_queries(self) -> Iterator[QueryLog]:
+        """Record every statement run on connections acquired in this context."""
+        query_log = QueryLog()
+        token = current_query_log.set(query_log)
+        try:
+            yield query_log
+        finally:
+            current_query_log.reset(token)
+
+    def status(self) -> dict:
+        """Pool and circuit breaker state for health checks."""
+        status = {"connected": self.pool is not None, **self.breaker.snapshot()}
+        if self.pool:
+            status["pool_size"] = self.pool.get_size()
+            status["pool_idle"] = self.pool.get_idle_size()
+        return status
 
 
 db = Database()
@@ -0,0 +1,66 @@
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+
+@dataclass
+class QueryRecord:
+    query: str
+    elapsed: float
+
+
+@dataclass
+class QueryLog:
+    """
+    Statements executed while tracking is active, grouped by connection
+    checkout. Requests share one checkout, so each session is one request.
+    """
+
+    sessions: list[list[QueryRecord]] = field(default_factory=list)
+
+    def start_session(self) -> list[QueryRecord]:
+        session: list[QueryRecord] = []
+        self.sessions.append(session)
+        return session
+
+    @property
+    def queries(self) -> list[QueryRecord]:
+        return [record for session in self.sessions for record in session]
+
+
+current_query_log: ContextVar[QueryLog | None] = ContextVar(
+    "current_query_log", default=None
+)
+
+
+class InstrumentedConnection:
+    """Connection proxy that records each statement and how long it took."""
+
+    def __init__(self, connection, session: list[QueryRecord]):
+        self._connection = connection
+        self._session = session
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    async def _run(self, method: str, query: str, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await getattr(self._connection, method)(query, *args, **kwargs)
+        finally:
+            self._session.append(QueryRecord(query, time.perf_counter() - start))
+
+    async def execute(self, query: str, *args, **kwargs):
+        return await self._run("execute", query, *args, **kwargs)
+
+    async def executemany(self, query: str, *args, **kwargs):
+        return await self._run("executemany", query, *args, **kwargs)
+
+    async def fetch(self, query: str, *args, **kwargs):
+        return await self._run("fetch", query, *args, **kwargs)
+
+    async def fetchrow(self, query: str, *args, **kwargs):
+        return await self._run("fetchrow", query, *args, **kwargs)
+
+    async def fetchval(self, query: str, *args, **kwargs):
+        return await self._run("fetchval", query, *args, **kwargs)
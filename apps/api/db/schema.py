@@ -7,10 +7,14 @@ CREATE TABLE IF NOT EXISTS users (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     email VARCHAR(255) UNIQUE NOT NULL,
     name VARCHAR(255),
+    data_version BIGINT DEFAULT 0 NOT NULL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW() NOT NULL,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW() NOT NULL
 );
 
+-- Per-user data version, bumped on every attempt write
+ALTER TABLE users ADD COLUMN IF NOT EXISTS data_version BIGINT DEFAULT 0 NOT NULL;
+
 -- Questions table
 CREATE TABLE IF NOT EXISTS questions (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -35,6 +39,19 @@ CREATE TABLE IF NOT EXISTS attempts (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW() NOT NULL
 );
 
+-- Spaced-repetition schedule, one row per (user, question) answered
+CREATE TABLE IF NOT EXISTS review_schedule (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    question_id UUID NOT NULL REFERENCES questions(id) ON DELETE CASCADE,
+    category VARCHAR(100) NOT NULL,
+    repetitions INTEGER NOT NULL,
+    interval_days INTEGER NOT NULL,
+    ease_factor DOUBLE PRECISION NOT NULL,
+    due_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW() NOT NULL,
+    PRIMARY KEY (user_id, question_id)
+);
+
 -- Chat threads table
 CREATE TABLE IF NOT EXISTS chat_threads (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -60,6 +77,7 @@ CREATE INDEX IF NOT EXISTS idx_questions_category ON questions(category);
 CREATE INDEX IF NOT EXISTS idx_attempts_user_id ON attempts(user_id);
 CREATE INDEX IF NOT EXISTS idx_attempts_user_question ON attempts(user_id, question_id);
 CREATE INDEX IF NOT EXISTS idx_attempts_created_at ON attempts(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_review_schedule_user_due ON review_schedule(user_id, due_at);
 CREATE INDEX IF NOT EXISTS idx_chat_threads_user_id ON chat_threads(user_id);
 CREATE INDEX IF NOT EXISTS idx_chat_messages_thread_id ON chat_messages(thread_id, created_at);
 """
@@ -75,6 +93,7 @@ async def drop_tables(connection):
     await connection.execute("""
         DROP TABLE IF EXISTS chat_messages CASCADE;
         DROP TABLE IF EXISTS chat_threads CASCADE;
+        DROP TABLE IF EXISTS review_schedule CASCADE;
         DROP TABLE IF EXISTS attempts CASCADE;
         DROP TABLE IF EXISTS questions CASCADE;
         DROP TABLE IF EXISTS users CASCADE;
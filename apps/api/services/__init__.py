@@ -0,0 +1,75 @@
+from services.bundles import BundleStore, build_bundles, bundle_store, write_bundles
+from services.cache import LRUCache, SharedCache
+from services.chat_context import (
+    QuestionContextCache,
+    build_messages,
+    build_system_blocks,
+    load_question_context,
+    question_contexts,
+    render_question_context,
+)
+from services.cohort import CohortHistograms, cohort, refresh_cohort
+from services.invalidation import (
+    INVALIDATION_CHANNEL,
+    handle_invalidation,
+    invalidation_listener,
+)
+from services.progress import (
+    ProgressBitmap,
+    ProgressCache,
+    QuestionIndex,
+    load_progress,
+    progress_cache,
+    question_index,
+)
+from services.review import (
+    CANDIDATE_FACTOR,
+    DUE_REVIEWS_SQL,
+    SCHEDULE_REVIEW_SQL,
+    ReviewState,
+    prioritize_due,
+    schedule_review,
+)
+from services.versioning import (
+    VersionedResponseCache,
+    etag_matches,
+    make_etag,
+    response_cache,
+)
+
+__all__ = [
+    "BundleStore",
+    "build_bundles",
+    "bundle_store",
+    "write_bundles",
+    "LRUCache",
+    "SharedCache",
+    "QuestionContextCache",
+    "build_messages",
+    "build_system_blocks",
+    "load_question_context",
+    "question_contexts",
+    "render_question_context",
+    "CohortHistograms",
+    "cohort",
+    "refresh_cohort",
+    "INVALIDATION_CHANNEL",
+    "handle_invalidation",
+    "invalidation_listener",
+    "ProgressBitmap",
+    "ProgressCache",
+    "QuestionIndex",
+    "load_progress",
+    "progress_cache",
+    "question_index",
+    "CANDIDATE_FACTOR",
+    "DUE_REVIEWS_SQL",
+    "SCHEDULE_REVIEW_SQL",
+    "ReviewState",
+    "prioritize_due",
+    "schedule_review",
+    "VersionedResponseCache",
+    "etag_matches",
+    "make_etag",
+    "response_cache",
+]
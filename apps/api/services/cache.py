@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import stat
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+DEFAULT_SHARED_MAX_ENTRIES = 50_000
+
+# Trim the shared store once every this many writes rather than on each one.
+TRIM_EVERY = 256
+
+
+# Name of the SQLite database inside the shared cache directory.
+STORE_NAME = "cache.sqlite3"
+
+
+def _private_directory(path: str) -> None:
+    """
+    Create the store's directory as 0700, refusing one another user could control.
+
+    The directory usually lives in world-writable /dev/shm. SQLite opens
+    ``-wal`` and ``-shm`` files next to the database, so the directory, not
+    just the database file, has to be ours: anyone who can create files in
+    it could plant those and corrupt or forge entries.
+    """
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"Shared cache {path} is not a directory")
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"Shared cache {path} is owned by another user")
+    if info.st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+        raise PermissionError(f"Shared cache {path} is accessible to other users")
+
+
+class SharedCache:
+    """
+    Byte store shared by every worker process on the host.
+
+    Backed by SQLite in WAL mode inside the private directory ``path``; put
+    it on tmpfs (e.g. /dev/shm) so the pages live in shared memory. Calls run on the event loop, so the
+    busy timeout is zero: a locked store is treated as a miss (or a skipped
+    write) instead of stalling the worker. Any other SQLite error is
+    handled the same way, so the store never fails a request.
+    """
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_SHARED_MAX_ENTRIES):
+        _private_directory(path)
+        self.path = os.path.join(path, STORE_NAME)
+        self.max_entries = max_entries
+        self._writes = 0
+        self._conn = sqlite3.connect(
+            self.path, isolation_level=None, check_same_thread=False, timeout=0
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL)"
+        )
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            row = self._conn.execute(
+                "SELECT value FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes) -> None:
+        try:
+            # REPLACE assigns a fresh rowid, so rowid order tracks write order
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value) VALUES (?, ?)",
+                (key, value),
+            )
+            self._writes += 1
+            if self._writes % TRIM_EVERY == 0:
+                self._conn.execute(
+                    """
+                    DELETE FROM entries WHERE rowid IN (
+                        SELECT rowid FROM entries ORDER BY rowid DESC
+                        LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.max_entries,),
+                )
+        except sqlite3.Error:
+            pass
+
+    def delete(self, key: str) -> None:
+        try:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        except sqlite3.Error:
+            pass
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class LRUCache:
+    """
+    In-process LRU cache with an optional host-wide shared tier behind it.
+
+    Local misses fall through to ``shared`` when one is attached; values
+    found there are copied into the local tier. Values cross the shared
+    tier as JSON, so only keys that ``_encode``/``_decode`` handle (see the
+    subclasses) are shared; everything else stays process-local.
+    """
+
+    def __init__(self, max_entries: int, namespace: str):
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self.shared: SharedCache | None = None
+        self._entries: OrderedDict = OrderedDict()
+
+    def _shared_key(self, key: Hashable) -> str:
+        return f"{self.namespace}:{key!r}"
+
+    def _encode(self, key: Hashable, value: Any) -> bytes | None:
+        return None
+
+    def _decode(self, key: Hashable, data: bytes) -> Any:
+        return None
+
+    def _set_local(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: Hashable) -> Any | None:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+            return value
+        if self.shared is not None:
+            data = self.shared.get(self._shared_key(key))
+            if data is not None:
+                value = self._decode(key, data)
+                if value is not None:
+                    self._set_local(key, value)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._set_local(key, value)
+        if self.shared is not None:
+            data = self._encode(key, value)
+            if data is not None:
+                self.shared.set(self._shared_key(key), data)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Evict from this process and from the shared tier."""
+        self.invalidate_local(key)
+        if self.shared is not None:
+            self.shared.delete(self._shared_key(key))
+
+    def invalidate_local(self, key: Hashable) -> None:
+        """Evict from this process only, e.g. on another worker's notice."""
+        self._entries.pop(key, None)
+
+    def _evict_local_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        for key in [key for key in self._entries if predicate(key)]:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -0,0 +1,129 @@
+import json
+from typing import Mapping
+
+from services.cache import LRUCache
+
+DEFAULT_MAX_QUESTIONS = 2048
+
+SYSTEM_PROMPT = """あなたは看護師国家試験の学習をサポートするAIアシスタントです。
+医学・看護学に関する質問に丁寧に回答してください。
+
+重要な免責事項:
+- このチャットは学習支援を目的としており、医療上のアドバイスではありません
+- 実際の医療判断は必ず医療専門家にご相談ください
+- 試験対策としての知識提供を目的としています"""
+
+QUESTION_CONTEXT_TEMPLATE = """ユーザーは次の問題を学習中です。この問題に関する質問にはこの情報を踏まえて回答してください。
+
+【問題】{year}年 第{number}問（{category}）
+{question_text}
+
+【選択肢】
+{choices}
+
+【正解】{correct_answer}
+
+【解説】
+{explanation}"""
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def render_question_context(question: Mapping) -> str:
+    """Render a question row into the static context block sent to the model."""
+    choices = question["choices"]
+    if isinstance(choices, str):
+        choices = json.loads(choices)
+    correct_answer = question["correct_answer"]
+    if 0 <= correct_answer < len(choices):
+        correct_answer_text = f"{correct_answer + 1}. {choices[correct_answer]}"
+    else:
+        # Bad data shouldn't fail the chat; the number alone is still useful
+        correct_answer_text = f"{correct_answer + 1}."
+    return QUESTION_CONTEXT_TEMPLATE.format(
+        year=question["year"],
+        number=question["number"],
+        category=question["category"],
+        question_text=question["question_text"],
+        choices="\n".join(f"{i + 1}. {choice}" for i, choice in enumerate(choices)),
+        correct_answer=correct_answer_text,
+        explanation=question["explanation"] or "（解説なし）",
+    )
+
+
+def build_system_blocks(question_context: str | None = None) -> list[dict]:
+    """
+    Build the system prompt as content blocks for prompt caching.
+
+    The disclaimer and question context are too short to be cached on their
+    own (the minimum cacheable prefix is ~1024 tokens), so a single
+    breakpoint marks the end of the whole static prefix. That lets it be
+    cached together with the history once the conversation is long enough.
+    """
+    blocks = [{"type": "text", "text": SYSTEM_PROMPT}]
+    if question_context:
+        blocks.append({"type": "text", "text": question_context})
+    blocks[-1]["cache_control"] = CACHE_CONTROL
+    return blocks
+
+
+def build_messages(
+    message: str, history: list[dict[str, str]] | None = None
+) -> list[dict]:
+    """
+    Build the message list with a cache breakpoint on the last history turn.
+
+    Each follow-up resends the same history plus one new message, so the
+    prefix up to the last history turn is what gets reused across turns.
+    """
+    messages: list[dict] = [
+        {"role": h["role"], "content": h["content"]} for h in history or []
+    ]
+    if messages:
+        last = messages[-1]
+        last["content"] = [
+            {"type": "text", "text": last["content"], "cache_control": CACHE_CONTROL}
+        ]
+    messages.append({"role": "user", "content": message})
+    return messages
+
+
+class QuestionContextCache(LRUCache):
+    """
+    LRU cache of rendered question context keyed by question id.
+
+    Entries carry no version, so they stay process-local (no codec for the
+    shared tier, which outlives restarts and would keep serving text from
+    before a question was edited).
+    """
+
+    def __init__(self, max_questions: int = DEFAULT_MAX_QUESTIONS):
+        super().__init__(max_questions, namespace="question_context")
+
+
+QUESTION_CONTEXT_SQL = """
+SELECT year, number, category, question_text, choices,
+       correct_answer, explanation
+FROM questions
+WHERE id = $1
+"""
+
+
+async def load_question_context(
+    connection, question_id, cache: QuestionContextCache
+) -> str | None:
+    """Return the rendered context, loading the question on a cache miss."""
+    context = cache.get(question_id)
+    if context is not None:
+        return context
+
+    question = await connection.fetchrow(QUESTION_CONTEXT_SQL, question_id)
+    if not question:
+        return None
+
+    context = render_question_context(question)
+    cache.set(question_id, context)
+    return context
+
+
+question_contexts = QuestionContextCache()
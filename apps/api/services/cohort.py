@@ -0,0 +1,127 @@
+import hashlib
+import json
+from collections import defaultdict
+from typing import Iterable, Mapping
+
+DEFAULT_BUCKETS = 20
+
+
+class CohortHistograms:
+    """
+    Per-category histograms of user accuracy rates.
+
+    Each category keeps a fixed number of equal-width buckets over 0-100%,
+    counting how many users currently fall into each one. Updating a user
+    moves them between buckets in O(1), and a percentile lookup walks the
+    buckets once, so neither depends on the number of users.
+
+    ``fingerprint`` hashes the buckets as of the last full reload, so
+    cached rankings can be keyed on it: it only changes when the cohort
+    does, and workers that loaded the same data agree on it. Attempts
+    recorded between reloads don't change it, so rankings served under
+    one fingerprint are approximate until the next reload.
+    """
+
+    def __init__(self, buckets: int = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.fingerprint = ""
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget all cohort data until the next load."""
+        self.loaded = False
+        self._histograms: dict[str, list[int]] = {}
+        self._user_stats: dict[tuple[object, str], tuple[int, int]] = {}
+
+    def _bucket(self, total: int, correct: int) -> int:
+        accuracy_rate = correct / total * 100 if total > 0 else 0.0
+        return min(int(accuracy_rate * self.buckets / 100), self.buckets - 1)
+
+    def _histogram(self, category: str) -> list[int]:
+        histogram = self._histograms.get(category)
+        if histogram is None:
+            histogram = self._histograms[category] = [0] * self.buckets
+        return histogram
+
+    def load(self, rows: Iterable[Mapping]) -> None:
+        """Rebuild all histograms from (user_id, category, total, correct) rows."""
+        histograms: dict[str, list[int]] = defaultdict(lambda: [0] * self.buckets)
+        user_stats: dict[tuple[object, str], tuple[int, int]] = {}
+        for row in rows:
+            total, correct = row["total"], row["correct"]
+            user_stats[(row["user_id"], row["category"])] = (total, correct)
+            histograms[row["category"]][self._bucket(total, correct)] += 1
+
+        self._histograms = dict(histograms)
+        self._user_stats = user_stats
+        self.loaded = True
+        self.fingerprint = hashlib.sha256(
+            json.dumps(sorted(self._histograms.items())).encode()
+        ).hexdigest()[:16]
+
+    def record(self, user_id: object, category: str, is_correct: bool) -> None:
+        """Apply a single new attempt to the user's position in the histogram."""
+        if not self.loaded:
+            # Without a baseline we can't tell which bucket the user is leaving.
+            return
+
+        histogram = self._histogram(category)
+        key = (user_id, category)
+        previous = self._user_stats.get(key)
+        if previous is not None:
+            histogram[self._bucket(*previous)] -= 1
+            total, correct = previous
+        else:
+            total, correct = 0, 0
+
+        total += 1
+        correct += 1 if is_correct else 0
+        self._user_stats[key] = (total, correct)
+        histogram[self._bucket(total, correct)] += 1
+
+    def user_accuracy(self, user_id: object, category: str) -> float | None:
+        """The user's accuracy rate in a category, if known."""
+        stats = self._user_stats.get((user_id, category))
+        if stats is None or stats[0] == 0:
+            return None
+        total, correct = stats
+        return correct / total * 100
+
+    def percentile_rank(self, category: str, accuracy_rate: float) -> float | None:
+        """
+        Percentage of users in the category ranked below the given accuracy.
+
+        Users sharing the same bucket count as half below, half above.
+        Returns None when no cohort data exists for the category.
+        """
+        histogram = self._histograms.get(category)
+        if not histogram:
+            return None
+        users = sum(histogram)
+        if users == 0:
+            return None
+
+        bucket = min(int(accuracy_rate * self.buckets / 100), self.buckets - 1)
+        below = sum(histogram[:bucket])
+        return (below + histogram[bucket] / 2) / users * 100
+
+
+COHORT_STATS_SQL = """
+SELECT
+    a.user_id,
+    q.category,
+    COUNT(*) as total,
+    COUNT(*) FILTER (WHERE a.is_correct) as correct
+FROM attempts a
+JOIN questions q ON a.question_id = q.id
+GROUP BY a.user_id, q.category
+"""
+
+
+async def refresh_cohort(connection, histograms: CohortHistograms) -> None:
+    """Reload cohort histograms from the attempts table."""
+    rows = await connection.fetch(COHORT_STATS_SQL)
+    histograms.load(rows)
+
+
+cohort = CohortHistograms()
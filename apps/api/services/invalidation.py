@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import uuid
+
+import asyncpg
+
+from services.progress import progress_cache
+from services.versioning import response_cache
+
+# Writers notify this channel with the user id, from the same statement
+# that bumps the user's data version, so the notice is sent on commit.
+# Cached entries are keyed on the data version, so this only frees memory
+# early; correctness does not depend on the notice arriving.
+INVALIDATION_CHANNEL = "cache_invalidation"
+
+# Backoff bounds in seconds for re-establishing the LISTEN connection.
+RECONNECT_MIN_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30.0
+
+logger = logging.getLogger(__name__)
+
+
+def handle_invalidation(payload: str) -> None:
+    """Evict a user's entries from this process's local caches."""
+    try:
+        user_id = uuid.UUID(payload)
+    except ValueError:
+        return
+    progress_cache.evict_user(user_id)
+    response_cache.evict_user(user_id)
+
+
+class InvalidationListener:
+    """
+    Dedicated LISTEN connection for cross-worker cache invalidation.
+
+    It sits outside the pool so it never takes a slot from request handling.
+    If the connection drops, local cache entries are cleared (notices may
+    have been missed) and the listener reconnects with exponential backoff.
+    """
+
+    def __init__(self):
+        self._connection: asyncpg.Connection | None = None
+        self._database_url: str | None = None
+        self._reconnect_task: asyncio.Task | None = None
+        self._stopping = False
+
+    @property
+    def connected(self) -> bool:
+        return self._connection is not None
+
+    async def start(self, database_url: str) -> None:
+        self._database_url = database_url
+        self._stopping = False
+        try:
+            await self._connect()
+        except (OSError, asyncpg.PostgresError) as e:
+            logger.warning("Cache invalidation listener failed to connect: %s", e)
+            self._schedule_reconnect()
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+            try:
+                await self._reconnect_task
+            except asyncio.CancelledError:
+                pass
+            self._reconnect_task = None
+        if self._connection:
+            await self._connection.close()
+            self._connection = None
+
+    async def _connect(self) -> None:
+        connection = await asyncpg.connect(self._database_url)
+        connection.add_termination_listener(self._on_terminated)
+        await connection.add_listener(INVALIDATION_CHANNEL, self._on_notify)
+        self._connection = connection
+
+    def _schedule_reconnect(self) -> None:
+        if self._stopping or (self._reconnect_task and not self._reconnect_task.done()):
+            return
+        self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = RECONNECT_MIN_DELAY
+        while not self._stopping:
+            await asyncio.sleep(delay)
+            try:
+                await self._connect()
+            except (OSError, asyncpg.PostgresError) as e:
+                logger.warning("Cache invalidation listener reconnect failed: %s", e)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+            # Notices sent while we were away are lost; start from scratch.
+            progress_cache.clear()
+            response_cache.clear()
+            logger.info("Cache invalidation listener reconnected")
+            return
+
+    def _on_terminated(self, connection) -> None:
+        if connection is not self._connection:
+            return
+        self._connection = None
+        if self._stopping:
+            return
+        logger.warning("Cache invalidation listener connection lost")
+        progress_cache.clear()
+        response_cache.clear()
+        self._schedule_reconnect()
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        handle_invalidation(payload)
+
+
+invalidation_listener = InvalidationListener()
@@ -0,0 +1,154 @@
+import base64
+import hashlib
+import json
+from typing import Iterable, Mapping
+
+from services.cache import LRUCache
+
+DEFAULT_MAX_USERS = 1024
+
+
+class QuestionIndex:
+    """
+    Stable position of every question in the bank.
+
+    Questions are ordered by (year, number), so the index only shifts when
+    questions are inserted into an earlier exam. The version hash changes
+    whenever the ordering does, letting clients detect a stale mapping.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop the index so it is reloaded on next use."""
+        self.loaded = False
+        self.question_ids: list = []
+        self.positions: dict = {}
+        self.version = ""
+
+    def load(self, question_ids: Iterable) -> None:
+        """Rebuild the index from question ids in display order."""
+        self.question_ids = list(question_ids)
+        self.positions = {qid: i for i, qid in enumerate(self.question_ids)}
+        digest = hashlib.sha256()
+        for qid in self.question_ids:
+            digest.update(str(qid).encode())
+        self.version = digest.hexdigest()[:16]
+        self.loaded = True
+
+    async def refresh(self, connection) -> None:
+        """Reload the index from the questions table."""
+        rows = await connection.fetch(
+            "SELECT id FROM questions ORDER BY year, number"
+        )
+        self.load(row["id"] for row in rows)
+
+    async def ensure_loaded(self, connection) -> None:
+        """Load the index from the questions table if not already loaded."""
+        if not self.loaded:
+            await self.refresh(connection)
+
+
+class ProgressBitmap:
+    """
+    A user's per-question state packed as one bit per question per flag.
+
+    Bit ``i`` refers to position ``i`` in the question index and is stored
+    in byte ``i // 8`` at bit ``i % 8`` (least significant bit first).
+    """
+
+    def __init__(self, size: int, index_version: str = ""):
+        self.size = size
+        self.index_version = index_version
+        self.answered = bytearray((size + 7) // 8)
+        self.correct = bytearray((size + 7) // 8)
+
+    @staticmethod
+    def _set(bits: bytearray, position: int) -> None:
+        bits[position >> 3] |= 1 << (position & 7)
+
+    @classmethod
+    def from_rows(
+        cls, rows: Iterable[Mapping], index: QuestionIndex
+    ) -> "ProgressBitmap":
+        """Build from (question_id, is_correct) rows of the latest attempts."""
+        bitmap = cls(len(index.question_ids), index.version)
+        for row in rows:
+            position = index.positions.get(row["question_id"])
+            if position is None:
+                continue
+            cls._set(bitmap.answered, position)
+            if row["is_correct"]:
+                cls._set(bitmap.correct, position)
+        return bitmap
+
+    @staticmethod
+    def encode(bits: bytearray) -> str:
+        return base64.b64encode(bytes(bits)).decode("ascii")
+
+
+class ProgressCache(LRUCache):
+    """
+    LRU cache of progress bitmaps keyed by (user id, data version).
+
+    A new attempt bumps the user's data version, so older bitmaps can't be
+    reached even if a slow rebuild stores one after the write.
+    """
+
+    def __init__(self, max_users: int = DEFAULT_MAX_USERS):
+        super().__init__(max_users, namespace="progress")
+
+    def _encode(self, key, bitmap: ProgressBitmap) -> bytes:
+        return json.dumps(
+            {
+                "size": bitmap.size,
+                "index_version": bitmap.index_version,
+                "answered": bitmap.encode(bitmap.answered),
+                "correct": bitmap.encode(bitmap.correct),
+            }
+        ).encode()
+
+    def _decode(self, key, data: bytes) -> ProgressBitmap:
+        fields = json.loads(data)
+        bitmap = ProgressBitmap(fields["size"], fields["index_version"])
+        bitmap.answered = bytearray(base64.b64decode(fields["answered"]))
+        bitmap.correct = bytearray(base64.b64decode(fields["correct"]))
+        return bitmap
+
+    def evict_user(self, user_id) -> None:
+        """Drop this process's bitmaps for a user, whatever their version."""
+        self._evict_local_where(lambda key: key[0] == user_id)
+
+
+LATEST_ATTEMPTS_SQL = """
+SELECT DISTINCT ON (question_id)
+    question_id,
+    is_correct
+FROM attempts
+WHERE user_id = $1
+ORDER BY question_id, created_at DESC
+"""
+
+
+async def load_progress(
+    connection,
+    user_id,
+    data_version: int,
+    index: QuestionIndex,
+    cache: ProgressCache,
+) -> ProgressBitmap:
+    """Return the user's progress bitmap, building it on a cache miss."""
+    key = (user_id, data_version)
+    bitmap = cache.get(key)
+    if bitmap is not None and bitmap.index_version == index.version:
+        return bitmap
+
+    rows = await connection.fetch(LATEST_ATTEMPTS_SQL, user_id)
+    bitmap = ProgressBitmap.from_rows(rows, index)
+    cache.set(key, bitmap)
+    return bitmap
+
+
+question_index = QuestionIndex()
+progress_cache = ProgressCache()
@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+from typing import Callable, Iterable, Mapping
+
+DEFAULT_EASE_FACTOR = 2.5
+MIN_EASE_FACTOR = 1.3
+
+# SM-2 grades recall 0-5; a multiple-choice answer only tells us right or wrong.
+CORRECT_QUALITY = 4
+INCORRECT_QUALITY = 1
+
+# How many due rows to consider per requested item when reordering by weakness.
+CANDIDATE_FACTOR = 3
+
+
+@dataclass
+class ReviewState:
+    repetitions: int = 0
+    interval_days: int = 0
+    ease_factor: float = DEFAULT_EASE_FACTOR
+
+
+def _ease_change(quality: int) -> float:
+    return 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+
+
+def schedule_review(state: ReviewState | None, is_correct: bool) -> ReviewState:
+    """Apply one answer to a (user, question) schedule using SM-2."""
+    state = state or ReviewState()
+    quality = CORRECT_QUALITY if is_correct else INCORRECT_QUALITY
+
+    ease_factor = max(MIN_EASE_FACTOR, state.ease_factor + _ease_change(quality))
+
+    if quality < 3:
+        return ReviewState(repetitions=0, interval_days=1, ease_factor=ease_factor)
+
+    if state.repetitions == 0:
+        interval_days = 1
+    elif state.repetitions == 1:
+        interval_days = 6
+    else:
+        interval_days = round(state.interval_days * state.ease_factor)
+    return ReviewState(
+        repetitions=state.repetitions + 1,
+        interval_days=interval_days,
+        ease_factor=ease_factor,
+    )
+
+
+def prioritize_due(
+    rows: Iterable[Mapping],
+    category_accuracy: Callable[[str], float | None],
+    limit: int,
+) -> list[Mapping]:
+    """
+    Order due questions so weak categories come first.
+
+    ``category_accuracy`` returns the user's accuracy rate (0-100) for a
+    category, or None if unknown. Within a category, the longest-overdue
+    question comes first.
+    """
+    rows = list(rows)
+    accuracy: dict[str, float] = {}
+    for row in rows:
+        if row["category"] not in accuracy:
+            rate = category_accuracy(row["category"])
+            accuracy[row["category"]] = 50.0 if rate is None else rate
+
+    ordered = sorted(rows, key=lambda row: (accuracy[row["category"]], row["due_at"]))
+    return ordered[:limit]
+
+
+_NEXT_INTERVAL_SQL = """CASE
+        WHEN NOT $4 THEN 1
+        WHEN review_schedule.repetitions = 0 THEN 1
+        WHEN review_schedule.repetitions = 1 THEN 6
+        ELSE round(review_schedule.interval_days * review_schedule.ease_factor)::integer
+    END"""
+
+# Upsert for a (user, question) schedule; $1 user id, $2 question id,
+# $4 is_correct, $5 category, and $6-$8 the schedule_review(None, ...) state
+# for a first answer. An existing row is updated in SQL, mirroring
+# schedule_review, from the row ON CONFLICT has locked, so concurrent
+# answers to the same question are applied one after the other instead of
+# overwriting each other.
+SCHEDULE_REVIEW_SQL = f"""
+INSERT INTO review_schedule (
+    user_id, question_id, category,
+    repetitions, interval_days, ease_factor, due_at
+)
+VALUES ($1, $2, $5, $6, $7, $8, NOW() + make_interval(days => $7))
+ON CONFLICT (user_id, question_id) DO UPDATE SET
+    repetitions = CASE WHEN $4 THEN review_schedule.repetitions + 1 ELSE 0 END,
+    interval_days = {_NEXT_INTERVAL_SQL},
+    ease_factor = GREATEST(
+        {MIN_EASE_FACTOR},
+        review_schedule.ease_factor + CASE
+            WHEN $4 THEN {_ease_change(CORRECT_QUALITY)!r}
+            ELSE {_ease_change(INCORRECT_QUALITY)!r}
+        END
+    ),
+    due_at = NOW() + make_interval(days => {_NEXT_INTERVAL_SQL}),
+    updated_at = NOW()
+"""
+
+
+DUE_REVIEWS_SQL = """
+SELECT question_id, category, repetitions, interval_days, ease_factor, due_at
+FROM review_schedule
+WHERE user_id = $1 AND due_at <= NOW()
+ORDER BY due_at
+LIMIT $2
+"""
@@ -0,0 +1,58 @@
+from typing import Any, Hashable
+
+from pydantic import TypeAdapter
+
+from services.cache import LRUCache
+
+DEFAULT_MAX_ENTRIES = 4096
+
+
+def make_etag(*parts: object) -> str:
+    """Build a strong ETag from the values a response depends on."""
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class VersionedResponseCache(LRUCache):
+    """
+    LRU cache of response bodies keyed by (user, data version, params).
+
+    Bumping a user's data version makes their old entries unreachable, so
+    nothing needs to be invalidated explicitly; stale entries simply age
+    out of the LRU.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        super().__init__(max_entries, namespace="response")
+        self._adapters: dict[str, TypeAdapter] = {}
+
+    def register(self, kind: str, response_type: Any) -> None:
+        """Share entries whose key starts with ``kind`` as ``response_type``."""
+        self._adapters[kind] = TypeAdapter(response_type)
+
+    def _encode(self, key: Hashable, value: Any) -> bytes | None:
+        adapter = self._adapters.get(key[0])
+        return adapter.dump_json(value) if adapter else None
+
+    def _decode(self, key: Hashable, data: bytes) -> Any:
+        adapter = self._adapters.get(key[0])
+        return adapter.validate_json(data) if adapter else None
+
+    def evict_user(self, user_id) -> None:
+        """Drop this process's responses for a user, whatever their version."""
+        self._evict_local_where(lambda key: key[1] == user_id)
+
+
+response_cache = VersionedResponseCache()
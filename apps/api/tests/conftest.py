@@ -5,7 +5,14 @@ import pytest
 from httpx import ASGITransport, AsyncClient
 
 from main import app, settings
-from db import db
+from db import CircuitBreaker, db
+from services import (
+    cohort,
+    progress_cache,
+    question_contexts,
+    question_index,
+    response_cache,
+)
 
 
 @pytest.fixture(autouse=True)
@@ -14,10 +21,53 @@ def disable_db():
     original_url = settings.database_url
     settings.database_url = ""
     db.pool = None
+    db.breaker = CircuitBreaker()
     yield
     settings.database_url = original_url
 
 
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Start every test with empty in-process caches."""
+    cohort.reset()
+    progress_cache.clear()
+    question_index.reset()
+    question_contexts.clear()
+    response_cache.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def query_budget(request):
+    """
+    Enforce @pytest.mark.query_budget(max_queries=..., max_time=...) on every
+    request made during the test. max_time is in seconds per request.
+    """
+    marker = request.node.get_closest_marker("query_budget")
+    if marker is None:
+        yield None
+        return
+
+    max_queries = marker.kwargs.get("max_queries")
+    max_time = marker.kwargs.get("max_time")
+    with db.track_queries() as query_log:
+        yield query_log
+
+    for session in query_log.sessions:
+        statements = "\n".join(f"  {record.query.strip()}" for record in session)
+        if max_queries is not None and len(session) > max_queries:
+            pytest.fail(
+                f"Request ran {len(session)} queries, budget is {max_queries}:\n"
+                f"{statements}"
+            )
+        elapsed = sum(record.elapsed for record in session)
+        if max_time is not None and elapsed > max_time:
+            pytest.fail(
+                f"Request spent {elapsed:.3f}s in the database, "
+                f"budget is {max_time}s:\n{statements}"
+            )
+
+
 @pytest.fixture
 def enable_debug():
     """Enable debug mode for testing."""
@@ -27,6 +77,15 @@ def enable_debug():
     settings.debug = original
 
 
+@pytest.fixture
+def enable_request_transaction():
+    """Wrap each request in a single database transaction."""
+    original = settings.db_request_transaction
+    settings.db_request_transaction = True
+    yield
+    settings.db_request_transaction = original
+
+
 @pytest.fixture
 def set_allowlist():
     """Set allowlist for testing."""
@@ -0,0 +1,162 @@
+import json
+import uuid
+
+import pytest
+
+from services import BundleStore, build_bundles, bundle_store, write_bundles
+
+
+def make_question(category, number, explanation="解説"):
+    return {
+        "id": uuid.uuid4(),
+        "year": 2024,
+        "number": number,
+        "category": category,
+        "question_text": f"問題{number}",
+        "choices": '["A", "B", "C", "D"]',
+        "correct_answer": 1,
+        "explanation": explanation,
+    }
+
+
+@pytest.fixture
+def questions():
+    return [
+        make_question("基礎看護学", 1),
+        make_question("基礎看護学", 2),
+        make_question("成人看護学", 3),
+    ]
+
+
+@pytest.fixture
+def exported(tmp_path, questions):
+    manifest, files = build_bundles(questions)
+    write_bundles(str(tmp_path), manifest, files)
+    bundle_store.load(str(tmp_path))
+    yield manifest
+    bundle_store.close()
+
+
+class TestBuildBundles:
+    def test_splits_bodies_and_answers_per_category(self, questions):
+        manifest, files = build_bundles(questions)
+
+        assert [c["category"] for c in manifest["categories"]] == [
+            "基礎看護学",
+            "成人看護学",
+        ]
+        basic = manifest["categories"][0]
+        assert basic["count"] == 2
+
+        bodies = json.loads(files[basic["questions"]["file"]])
+        assert "correct_answer" not in bodies[0]
+        assert "explanation" not in bodies[0]
+        assert bodies[0]["choices"] == ["A", "B", "C", "D"]
+
+        answers = json.loads(files[basic["answers"]["file"]])
+        assert answers[bodies[0]["id"]] == {"correct_answer": 1, "explanation": "解説"}
+
+    def test_chunk_names_change_only_with_content(self, questions):
+        manifest, _ = build_bundles(questions)
+        same, _ = build_bundles(questions)
+        questions[2]["explanation"] = "新しい解説"
+        changed, _ = build_bundles(questions)
+
+        assert same["version"] == manifest["version"]
+        assert changed["version"] != manifest["version"]
+        # Only the edited category's answers chunk gets a new name.
+        adult, previous = changed["categories"][1], manifest["categories"][1]
+        assert adult["questions"] == previous["questions"]
+        assert adult["answers"] != previous["answers"]
+        assert changed["categories"][0] == manifest["categories"][0]
+
+
+class TestBundleStore:
+    def test_only_manifest_files_are_served(self, tmp_path, questions):
+        manifest, files = build_bundles(questions)
+        write_bundles(str(tmp_path), manifest, files)
+        (tmp_path / "secret.json").write_text("{}")
+
+        store = BundleStore()
+        store.load(str(tmp_path))
+        name = manifest["categories"][0]["questions"]["file"]
+
+        assert bytes(store.get(name)) == files[name]
+        assert store.get("secret.json") is None
+        assert store.get("../manifest.json") is None
+        store.close()
+
+    def test_missing_chunk_is_not_served(self, tmp_path, questions):
+        manifest, files = build_bundles(questions)
+        write_bundles(str(tmp_path), manifest, files)
+        name = manifest["categories"][0]["answers"]["file"]
+        (tmp_path / name).unlink()
+
+        store = BundleStore()
+        store.load(str(tmp_path))
+        assert store.get(name) is None
+        store.close()
+
+
+class TestWriteBundles:
+    def test_rewrites_truncated_chunk(self, tmp_path, questions):
+        manifest, files = build_bundles(questions)
+        name = manifest["categories"][0]["questions"]["file"]
+        (tmp_path / name).write_bytes(files[name][:10])
+
+        write_bundles(str(tmp_path), manifest, files)
+
+        assert (tmp_path / name).read_bytes() == files[name]
+        assert not list(tmp_path.glob("*.tmp"))
+
+
+class TestBundlesApi:
+    async def test_bundles_require_auth(self, client, exported):
+        response = await client.get("/bundles/manifest.json")
+        assert response.status_code == 401
+
+        entry = exported["categories"][0]["answers"]
+        response = await client.get(f"/bundles/{entry['file']}")
+        assert response.status_code == 401
+
+    async def test_manifest_unavailable_without_export(self, client, enable_debug):
+        response = await client.get(
+            "/bundles/manifest.json",
+            headers={"X-Debug-Email": "test@example.com"},
+        )
+        assert response.status_code == 404
+
+    async def test_serves_manifest_and_chunks(self, client, enable_debug, exported):
+        headers = {"X-Debug-Email": "test@example.com"}
+        response = await client.get("/bundles/manifest.json", headers=headers)
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == "private, no-cache"
+        assert response.json()["version"] == exported["version"]
+
+        entry = exported["categories"][0]["answers"]
+        response = await client.get(f"/bundles/{entry['file']}", headers=headers)
+        assert response.status_code == 200
+        assert response.headers["cache-control"].startswith("private")
+        assert "immutable" in response.headers["cache-control"]
+        assert len(response.content) == entry["bytes"]
+
+    async def test_manifest_revalidation_returns_304(
+        self, client, enable_debug, exported
+    ):
+        headers = {"X-Debug-Email": "test@example.com"}
+        first = await client.get("/bundles/manifest.json", headers=headers)
+
+        response = await client.get(
+            "/bundles/manifest.json",
+            headers={**headers, "If-None-Match": first.headers["etag"]},
+        )
+
+        assert response.status_code == 304
+        assert response.content == b""
+
+    async def test_unknown_chunk_returns_404(self, client, enable_debug, exported):
+        response = await client.get(
+            "/bundles/questions.0000000000000000.json",
+            headers={"X-Debug-Email": "test@example.com"},
+        )
+        assert response.status_code == 404
@@ -0,0 +1,176 @@
+import os
+import sqlite3
+import stat
+import uuid
+
+import pytest
+
+from services import (
+    ProgressBitmap,
+    ProgressCache,
+    SharedCache,
+    VersionedResponseCache,
+    handle_invalidation,
+    progress_cache,
+    response_cache,
+)
+from services import invalidation
+
+
+class TestSharedCache:
+    def test_entries_visible_across_instances(self, tmp_path):
+        path = str(tmp_path / "cache")
+        writer, reader = SharedCache(path), SharedCache(path)
+
+        writer.set("stats:1", b'{"total":3}')
+        assert reader.get("stats:1") == b'{"total":3}'
+
+        reader.delete("stats:1")
+        assert writer.get("stats:1") is None
+
+    def test_trims_oldest_entries(self, tmp_path):
+        cache = SharedCache(str(tmp_path / "cache"), max_entries=10)
+        for i in range(256):
+            cache.set(f"key:{i}", str(i).encode())
+
+        assert cache.get("key:0") is None
+        assert cache.get("key:255") == b"255"
+
+    def test_store_directory_is_private(self, tmp_path):
+        path = tmp_path / "cache"
+        cache = SharedCache(str(path))
+        cache.set("key", b"value")
+
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o700
+        assert os.path.dirname(cache.path) == str(path)
+
+    def test_refuses_directory_other_users_can_write(self, tmp_path):
+        path = tmp_path / "cache"
+        path.mkdir()
+        os.chmod(path, 0o777)
+        with pytest.raises(PermissionError):
+            SharedCache(str(path))
+
+    def test_refuses_symlinked_directory(self, tmp_path):
+        target = tmp_path / "elsewhere"
+        target.mkdir(mode=0o700)
+        path = tmp_path / "cache"
+        path.symlink_to(target)
+        with pytest.raises(PermissionError):
+            SharedCache(str(path))
+
+    def test_locked_store_is_a_miss(self, tmp_path):
+        cache = SharedCache(str(tmp_path / "cache"))
+        cache.set("key", b"value")
+
+        locker = sqlite3.connect(cache.path, isolation_level=None)
+        locker.execute("BEGIN EXCLUSIVE")
+        try:
+            cache.set("other", b"value")
+            assert cache.get("other") is None
+        finally:
+            locker.execute("ROLLBACK")
+            locker.close()
+
+
+class TestLRUCache:
+    def test_local_miss_falls_through_to_shared(self, tmp_path):
+        shared = SharedCache(str(tmp_path / "cache"))
+        first, second = VersionedResponseCache(), VersionedResponseCache()
+        first.shared = second.shared = shared
+        for cache in (first, second):
+            cache.register("stats", dict[str, int])
+
+        first.set(("stats", 1), {"total": 3})
+        assert second.get(("stats", 1)) == {"total": 3}
+
+        first.invalidate(("stats", 1))
+        second.invalidate_local(("stats", 1))
+        assert second.get(("stats", 1)) is None
+
+    def test_unregistered_values_stay_local(self, tmp_path):
+        shared = SharedCache(str(tmp_path / "cache"))
+        first, second = VersionedResponseCache(), VersionedResponseCache()
+        first.shared = second.shared = shared
+
+        first.set(("attempts", 1), ["body"])
+        assert first.get(("attempts", 1)) == ["body"]
+        assert second.get(("attempts", 1)) is None
+
+    def test_progress_bitmap_round_trips_through_shared(self, tmp_path):
+        shared = SharedCache(str(tmp_path / "cache"))
+        first, second = ProgressCache(), ProgressCache()
+        first.shared = second.shared = shared
+        bitmap = ProgressBitmap(10, "v1")
+        bitmap.answered[1] = 0b10
+
+        first.set(("user", 1), bitmap)
+        copy = second.get(("user", 1))
+
+        assert copy.size == 10
+        assert copy.index_version == "v1"
+        assert copy.answered == bitmap.answered
+
+    def test_invalidation_notice_evicts_local_entries(self):
+        user_id, other_id = uuid.uuid4(), uuid.uuid4()
+        progress_cache.set((user_id, 1), "bitmap")
+        progress_cache.set((user_id, 2), "bitmap")
+        response_cache.set(("stats", user_id, 2, ""), "stats")
+        response_cache.set(("stats", other_id, 2, ""), "stats")
+
+        handle_invalidation(str(user_id))
+        handle_invalidation("not-a-uuid")
+
+        assert progress_cache.get((user_id, 1)) is None
+        assert progress_cache.get((user_id, 2)) is None
+        assert response_cache.get(("stats", user_id, 2, "")) is None
+        assert response_cache.get(("stats", other_id, 2, "")) == "stats"
+
+
+class FakeListenConnection:
+    def __init__(self):
+        self.termination_listeners = []
+        self.listeners = {}
+        self.closed = False
+
+    def add_termination_listener(self, callback):
+        self.termination_listeners.append(callback)
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    async def close(self):
+        self.closed = True
+
+    def terminate(self):
+        for callback in self.termination_listeners:
+            callback(self)
+
+
+class TestInvalidationListener:
+    async def test_reconnects_after_connection_loss(self, monkeypatch):
+        connections = []
+
+        async def connect(database_url):
+            connections.append(FakeListenConnection())
+            return connections[-1]
+
+        monkeypatch.setattr(invalidation.asyncpg, "connect", connect)
+        monkeypatch.setattr(invalidation, "RECONNECT_MIN_DELAY", 0)
+        listener = invalidation.InvalidationListener()
+        await listener.start("postgresql://test")
+
+        user_id = uuid.uuid4()
+        progress_cache.set((user_id, 1), "bitmap")
+        connections[0].terminate()
+
+        # Notices may have been missed, so local entries are dropped.
+        assert not listener.connected
+        assert progress_cache.get((user_id, 1)) is None
+
+        await listener._reconnect_task
+        assert listener.connected
+        assert invalidation.INVALIDATION_CHANNEL in connections[1].listeners
+
+        await listener.stop()
+        assert connections[1].closed
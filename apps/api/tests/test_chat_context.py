@@ -0,0 +1,69 @@
+from services import build_messages, build_system_blocks, render_question_context
+from services.chat_context import SYSTEM_PROMPT
+
+
+class TestQuestionContext:
+    def test_render_question_context(self):
+        context = render_question_context(
+            {
+                "year": 2024,
+                "number": 3,
+                "category": "基礎看護学",
+                "question_text": "成人の正常な脈拍数はどれか。",
+                "choices": ["40〜50回", "60〜100回", "110〜130回"],
+                "correct_answer": 1,
+                "explanation": None,
+            }
+        )
+        assert "2024年 第3問（基礎看護学）" in context
+        assert "1. 40〜50回\n2. 60〜100回\n3. 110〜130回" in context
+        assert "【正解】2. 60〜100回" in context
+        assert "（解説なし）" in context
+
+    def test_render_question_context_with_bad_answer_index(self):
+        context = render_question_context(
+            {
+                "year": 2024,
+                "number": 3,
+                "category": "基礎看護学",
+                "question_text": "成人の正常な脈拍数はどれか。",
+                "choices": ["40〜50回", "60〜100回"],
+                "correct_answer": 4,
+                "explanation": "解説",
+            }
+        )
+        assert "【正解】5." in context
+
+    def test_system_blocks_mark_end_of_static_prefix(self):
+        blocks = build_system_blocks("問題の文脈")
+        assert [block["text"] for block in blocks] == [SYSTEM_PROMPT, "問題の文脈"]
+        assert "cache_control" not in blocks[0]
+        assert blocks[1]["cache_control"] == {"type": "ephemeral"}
+
+    def test_system_blocks_without_question(self):
+        blocks = build_system_blocks()
+        assert len(blocks) == 1
+        assert blocks[0]["cache_control"] == {"type": "ephemeral"}
+
+    def test_messages_mark_last_history_turn(self):
+        messages = build_messages(
+            "続けて",
+            [
+                {"role": "user", "content": "看護について教えて"},
+                {"role": "assistant", "content": "看護とは..."},
+            ],
+        )
+        assert messages[0] == {"role": "user", "content": "看護について教えて"}
+        assert messages[1]["content"] == [
+            {
+                "type": "text",
+                "text": "看護とは...",
+                "cache_control": {"type": "ephemeral"},
+            }
+        ]
+        assert messages[2] == {"role": "user", "content": "続けて"}
+
+    def test_messages_without_history(self):
+        assert build_messages("こんにちは") == [
+            {"role": "user", "content": "こんにちは"}
+        ]
@@ -0,0 +1,82 @@
+import uuid
+
+import pytest
+
+from services import CohortHistograms
+
+
+def make_row(category, total, correct, user_id=None):
+    return {
+        "user_id": user_id or uuid.uuid4(),
+        "category": category,
+        "total": total,
+        "correct": correct,
+    }
+
+
+class TestCohortHistograms:
+    def test_percentile_rank_without_data(self):
+        histograms = CohortHistograms()
+        histograms.load([])
+        assert histograms.percentile_rank("基礎看護学", 50.0) is None
+
+    def test_percentile_rank_counts_lower_buckets(self):
+        histograms = CohortHistograms(buckets=10)
+        histograms.load(
+            [
+                make_row("基礎看護学", 10, 1),
+                make_row("基礎看護学", 10, 3),
+                make_row("基礎看護学", 10, 9),
+                make_row("成人看護学", 10, 10),
+            ]
+        )
+        assert histograms.percentile_rank("基礎看護学", 50.0) == pytest.approx(200 / 3)
+        assert histograms.percentile_rank("基礎看護学", 0.0) == 0.0
+        # Perfect scores land in the top bucket rather than past the end.
+        assert histograms.percentile_rank("成人看護学", 100.0) == 50.0
+
+    def test_record_moves_user_between_buckets(self):
+        user_id = uuid.uuid4()
+        histograms = CohortHistograms(buckets=10)
+        histograms.load(
+            [
+                make_row("基礎看護学", 1, 0, user_id=user_id),
+                make_row("基礎看護学", 2, 1),
+            ]
+        )
+
+        histograms.record(user_id, "基礎看護学", True)
+        histograms.record(user_id, "基礎看護学", True)
+
+        # The user is now at 2/3, above the other user's 50%.
+        assert histograms.percentile_rank("基礎看護学", 66.0) == 75.0
+        assert sum(histograms._histograms["基礎看護学"]) == 2
+
+    def test_record_adds_new_user_and_category(self):
+        histograms = CohortHistograms(buckets=10)
+        histograms.load([])
+
+        histograms.record(uuid.uuid4(), "母性看護学", False)
+
+        assert histograms.percentile_rank("母性看護学", 0.0) == 50.0
+
+    def test_record_ignored_before_load(self):
+        histograms = CohortHistograms()
+        histograms.record(uuid.uuid4(), "基礎看護学", True)
+        assert histograms.percentile_rank("基礎看護学", 100.0) is None
+
+    def test_fingerprint_follows_content(self):
+        rows = [make_row("基礎看護学", 10, 5), make_row("成人看護学", 10, 9)]
+        first, second = CohortHistograms(), CohortHistograms()
+        first.load(rows)
+        second.load(list(reversed(rows)))
+        fingerprint = first.fingerprint
+
+        # Workers that loaded the same cohort agree, and reloads that
+        # change nothing keep the same validator.
+        assert second.fingerprint == fingerprint
+        first.load(rows)
+        assert first.fingerprint == fingerprint
+
+        first.load(rows + [make_row("基礎看護学", 10, 1)])
+        assert first.fingerprint != fingerprint
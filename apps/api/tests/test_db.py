@@ -0,0 +1,164 @@
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+import asyncpg
+import pytest
+
+from db import CircuitBreaker, DatabaseUnavailable
+from db.connection import Database
+
+
+def make_database(acquire, failure_threshold=2, reset_timeout=60.0):
+    database = Database()
+    database.pool = MagicMock()
+    database.pool.acquire = acquire
+    database.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+    return database
+
+
+def timing_out_acquire(timeout=None):
+    @asynccontextmanager
+    async def context():
+        raise TimeoutError
+        yield
+
+    return context()
+
+
+def working_acquire(timeout=None):
+    @asynccontextmanager
+    async def context():
+        yield "connection"
+
+    return context()
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60.0)
+        breaker.record_failure()
+        assert breaker.state == "closed"
+        breaker.record_failure()
+        assert breaker.state == "open"
+        assert not breaker.allow_request()
+        assert 1 <= breaker.retry_after() <= 60
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == "closed"
+
+    def test_half_open_allows_single_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+        breaker.record_failure()
+        assert breaker.state == "half_open"
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.0)
+        for _ in range(3):
+            breaker.record_failure()
+        assert breaker.allow_request()
+        breaker.reset_timeout = 60.0
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+
+class TestDatabaseAcquire:
+    async def test_acquire_timeout_raises_unavailable(self):
+        database = make_database(timing_out_acquire)
+
+        with pytest.raises(DatabaseUnavailable):
+            async with database.acquire():
+                pass
+        assert database.breaker.consecutive_failures == 1
+
+    async def test_open_breaker_fails_fast(self):
+        acquire = MagicMock(side_effect=timing_out_acquire)
+        database = make_database(acquire)
+
+        for _ in range(3):
+            with pytest.raises(DatabaseUnavailable) as exc_info:
+                async with database.acquire():
+                    pass
+
+        # The third call never reached the pool.
+        assert acquire.call_count == 2
+        assert exc_info.value.retry_after >= 1
+
+    async def test_single_timeout_asks_for_a_delay(self):
+        database = make_database(timing_out_acquire, failure_threshold=5)
+
+        with pytest.raises(DatabaseUnavailable) as exc_info:
+            async with database.acquire():
+                pass
+
+        assert database.breaker.state == "closed"
+        assert exc_info.value.retry_after == 1
+
+    async def test_connection_error_during_query_is_unavailable(self):
+        database = make_database(working_acquire)
+
+        with pytest.raises(DatabaseUnavailable):
+            async with database.acquire():
+                raise asyncpg.QueryCanceledError("canceling statement")
+
+        assert database.breaker.consecutive_failures == 1
+
+    async def test_query_errors_do_not_trip_breaker(self):
+        database = make_database(working_acquire, failure_threshold=1)
+
+        with pytest.raises(ValueError):
+            async with database.acquire():
+                raise ValueError
+
+        assert database.breaker.state == "closed"
+        async with database.acquire() as connection:
+            assert connection == "connection"
+
+    async def test_handler_timeouts_do_not_trip_breaker(self):
+        database = make_database(working_acquire, failure_threshold=1)
+
+        # The handler runs while the connection is held; its own I/O
+        # errors say nothing about the database.
+        for error in (TimeoutError, OSError):
+            with pytest.raises(error):
+                async with database.acquire():
+                    raise error
+
+        assert database.breaker.state == "closed"
+
+
+class TestQueryTracking:
+    async def test_track_queries_records_each_checkout(self):
+        connection = MagicMock()
+        connection.fetchval = AsyncMock(return_value=1)
+
+        def acquire(timeout=None):
+            @asynccontextmanager
+            async def context():
+                yield connection
+
+            return context()
+
+        database = make_database(acquire)
+
+        with database.track_queries() as query_log:
+            for _ in range(2):
+                async with database.acquire() as conn:
+                    assert await conn.fetchval("SELECT 1") == 1
+                    await conn.fetchval("SELECT 2")
+
+        assert [len(session) for session in query_log.sessions] == [2, 2]
+        assert query_log.queries[1].query == "SELECT 2"
+
+    async def test_connections_unwrapped_outside_tracking(self):
+        database = make_database(working_acquire)
+        async with database.acquire() as connection:
+            assert connection == "connection"
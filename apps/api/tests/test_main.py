@@ -1,8 +1,16 @@
+import asyncio
+import base64
 import uuid
 from datetime import datetime, timezone
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, MagicMock
 
+import asyncpg
 import pytest
+from httpx import ASGITransport, AsyncClient
+
+import main
+from db import db
+from services import ProgressBitmap, cohort, progress_cache, question_index
 
 
 class TestHealth:
@@ -12,6 +20,84 @@ class TestHealth:
         assert response.json() == {"status": "ok"}
 
 
+class TestDatabaseHealth:
+    async def test_health_db_unavailable_without_pool(self, client):
+        response = await client.get("/health/db")
+        assert response.status_code == 503
+        assert response.json()["database"]["connected"] is False
+
+    async def test_health_db_reports_breaker_state(self, client, mock_db):
+        db.pool.get_size.return_value = 10
+        db.pool.get_idle_size.return_value = 4
+
+        response = await client.get("/health/db")
+
+        assert response.status_code == 200
+        data = response.json()["database"]
+        assert data["state"] == "closed"
+        assert data["pool_idle"] == 4
+
+    async def test_slow_query_sheds_request(
+        self, client, enable_debug, mock_db, sample_user_id
+    ):
+        """A query timing out mid-request should return 503, not 500."""
+        mock_db.fetchrow = AsyncMock(
+            return_value={"id": sample_user_id, "data_version": 0}
+        )
+        mock_db.fetch = AsyncMock(
+            side_effect=asyncpg.QueryCanceledError("canceling statement")
+        )
+
+        response = await client.get(
+            "/attempts",
+            headers={"X-Debug-Email": "test@example.com"},
+        )
+
+        assert response.status_code == 503
+        assert int(response.headers["retry-after"]) >= 1
+
+    async def test_handler_os_error_is_not_a_database_failure(
+        self, enable_debug, mock_db, sample_user_id
+    ):
+        """Errors the handler raises on its own shouldn't trip the breaker."""
+        mock_db.fetchrow = AsyncMock(
+            return_value={"id": sample_user_id, "data_version": 0}
+        )
+        mock_db.fetch = AsyncMock(side_effect=OSError("disk full"))
+
+        async with AsyncClient(
+            transport=ASGITransport(app=main.app, raise_app_exceptions=False),
+            base_url="http://test",
+        ) as client:
+            response = await client.get(
+                "/attempts",
+                headers={"X-Debug-Email": "test@example.com"},
+            )
+
+        assert response.status_code == 500
+        assert db.breaker.consecutive_failures == 0
+
+    async def test_open_breaker_sheds_requests(self, client, enable_debug, mock_db):
+        """Requests should fail fast with Retry-After while the breaker is open."""
+        for _ in range(db.breaker.failure_threshold):
+            db.breaker.record_failure()
+
+        response = await client.get(
+            "/stats",
+            headers={"X-Debug-Email": "test@example.com"},
+        )
+
+        assert response.status_code == 503
+        assert int(response.headers["retry-after"]) >= 1
+        db.pool.acquire.assert_not_called()
+
+        db.pool.get_size.return_value = 10
+        db.pool.get_idle_size.return_value = 10
+        health = await client.get("/health/db")
+        assert health.status_code == 503
+        assert health.json()["database"]["state"] == "open"
+
+
 class TestAuthentication:
     async def test_chat_requires_auth(self, client):
         """Chat endpoint should return 401 without auth headers."""
@@ -74,6 +160,34 @@ class TestAuthentication:
         )
         assert response.status_code == 200
 
+    async def test_missing_auth_skips_pool(self, client, mock_db):
+        """Unauthenticated requests should be rejected before a checkout."""
+        response = await client.get("/stats")
+
+        assert response.status_code == 401
+        db.pool.acquire.assert_not_called()
+
+    async def test_allowlist_rejection_skips_pool(self, client, set_allowlist, mock_db):
+        """Non-allowlisted requests should be rejected before a checkout."""
+        response = await client.get(
+            "/stats",
+            headers={
+                "X-Goog-Authenticated-User-Email": "accounts.google.com:notallowed@example.com"
+            },
+        )
+
+        assert response.status_code == 403
+        db.pool.acquire.assert_not_called()
+
+    async def test_missing_auth_with_open_breaker(self, client, mock_db):
+        """Auth failures should stay 401 while the database is shedding load."""
+        for _ in range(db.breaker.failure_threshold):
+            db.breaker.record_failure()
+
+        response = await client.get("/stats")
+
+        assert response.status_code == 401
+
 
 class TestChatStream:
     async def test_chat_stream_returns_sse(self, client, enable_debug):
@@ -101,6 +215,73 @@ class TestChatStream:
         )
         assert response.status_code == 200
 
+    async def test_chat_stream_with_question_requires_db(self, client, enable_debug):
+        """Question-aware chat should return 503 when DB is not available."""
+        response = await client.post(
+            "/chat/stream",
+            json={"message": "解説して", "question_id": str(uuid.uuid4())},
+            headers={"X-Debug-Email": "test@example.com"},
+        )
+        assert response.status_code == 503
+
+    @pytest.mark.query_budget(max_queries=2)
+    async def test_chat_stream_with_question(
+        self, client, enable_debug, mock_db, sample_user_id, sample_question_id
+    ):
+        """Question context should be loaded once and reused across turns."""
+
+        async def mock_fetchrow_sequence(*args, **kwargs):
+            query = args[0] if args else ""
+            if "FROM users WHERE email" in query:
+                return {"id": sample_user_id, "data_version": 0}
+            elif "FROM questions" in query:
+                return {
+                    "year": 2024,
+                    "number": 1,
+                    "category": "基礎看護学",
+                    "question_text": "成人の正常な呼吸数はどれか。",
+                    "choices": '["8〜10回", "12〜20回"]',
+                    "correct_answer": 1,
+                    "explanation": "12〜20回/分です。",
+                }
+            return None
+
+        mock_db.fetchrow = AsyncMock(side_effect=mock_fetchrow_sequence)
+
+        for _ in range(2):
+            response = await client.post(
+                "/chat/stream",
+                json={"message": "解説して", "question_id": str(sample_question_id)},
+                headers={"X-Debug-Email": "test@example.com"},
+            )
+            assert response.status_code == 200
+
+        question_queries = [
+            call for call in mock_db.fetchrow.await_args_list
+            if "FROM questions" in call.args[0]
+        ]
+        assert len(question_queries) == 1
+
+    async def test_chat_stream_with_unknown_question(
+        self, client, enable_debug, mock_db, sample_user_id
+    ):
+        """Unknown question_id should return 404."""
+
+        async def mock_fetchrow_sequence(*args, **kwargs):
+            query = args[0] if args else ""
+            if "FROM users WHERE email" in query:
+                return {"id": sample_user_id, "data_version": 0}
+            return None
+
+        mock_db.fetchrow = AsyncMock(side_effect=mock_fetchrow_sequence)
+
+        response = await client.post(
+            "/chat/stream",
+            json={"message": "解説して", "question_id": str(uuid.uuid4())},
+            headers={"X-Debug-Email": "test@example.com"},
+        )
+        assert response.status_code == 404
+
 
 class TestAttempts:
     async def test_attempts_requires_auth(self, client):
@@ -128,6 +309,7 @@ class TestAttempts:
         )
         assert response.status_code == 503
 
+    @pytest.mark.query_budget(max_queries=3)
     async def test_create_attempt_with_mock_db(
         self, client, enable_debug, mock_db, sample_user_id, sample_question_id
     ):
@@ -137,7 +319,7 @@ class TestAttempts:
 
         # Mock user lookup
         mock_db.fetchrow.side_effect = [
-            {"id": sample_user_id},  # User lookup
+            {"id": sample_user_id, "data_version": 0},  # User lookup
             {"correct_answer": 1, "explanation": "Test explanation"},  # Question lookup
         ]
         mock_db.fetchval.return_value = sample_user_id
@@ -146,15 +328,20 @@ class TestAttempts:
         async def mock_fetchrow_sequence(*args, **kwargs):
             # Check which query is being made
             query = args[0] if args else ""
-            if "SELECT id FROM users" in query:
-                return {"id": sample_user_id}
-            elif "SELECT correct_answer" in query:
-                return {"correct_answer": 1, "explanation": "Test explanation"}
+            if "FROM users WHERE email" in query:
+                return {"id": sample_user_id, "data_version": 0}
+            elif "FROM questions WHERE id" in query:
+                return {
+                    "correct_answer": 1,
+                    "explanation": "Test explanation",
+                    "category": "基礎看護学",
+                }
             elif "INSERT INTO attempts" in query:
                 return {"id": attempt_id, "created_at": now}
             return None
 
         mock_db.fetchrow = AsyncMock(side_effect=mock_fetchrow_sequence)
+        progress_cache.set((sample_user_id, 0), ProgressBitmap(0))
 
         response = await client.post(
             "/attempts",
@@ -169,7 +356,17 @@ class TestAttempts:
         data = response.json()
         assert data["is_correct"] is True
         assert data["correct_answer"] == 1
+        assert progress_cache.get((sample_user_id, 0)) is None
+
+        # The invalidation notice rides on the write itself, not its own query.
+        write = next(
+            call for call in mock_db.fetchrow.await_args_list
+            if "INSERT INTO attempts" in call.args[0]
+        )
+        assert "pg_notify" in write.args[0]
+        mock_db.execute.assert_not_awaited()
 
+    @pytest.mark.query_budget(max_queries=2)
     async def test_list_attempts_with_mock_db(
         self, client, enable_debug, mock_db, sample_user_id, sample_question_id
     ):
@@ -179,8 +376,8 @@ class TestAttempts:
 
         async def mock_fetchrow_sequence(*args, **kwargs):
             query = args[0] if args else ""
-            if "SELECT id FROM users" in query:
-                return {"id": sample_user_id}
+            if "FROM users WHERE email" in query:
+                return {"id": sample_user_id, "data_version": 0}
             return None
 
         mock_db.fetchrow = AsyncMock(side_effect=mock_fetchrow_sequence)
@@ -208,6 +405,42 @@ class TestAttempts:
         assert len(data) == 1
         assert data[0]["is_correct"] is True
 
+    @pytest.mark.query_budget(max_queries=2)
+    async def test_request_shares_one_connection(
+        self, client, enable_debug, mock_db, sample_user_id
+    ):
+        """Auth and handler should share a single pool checkout."""
+        mock_db.fetchrow = AsyncMock(return_value={"id": sample_user_id, "data_version": 0})
+        mock_db.fetch = AsyncMock(return_value=[])
+
+        response = await client.get(
+            "/attempts",
+            headers={"X-Debug-Email": "test@example.com"},
+        )
+
+        assert response.status_code == 200
+        assert db.pool.acquire.call_count == 1
+
+    async def test_request_transaction_mode(
+        self, client, enable_debug, enable_request_transaction, mock_db, sample_user_id
+    ):
+        """Opt-in mode should run the whole request in one transaction."""
+        transaction = MagicMock()
+        transaction.__aenter__ = AsyncMock()
+        transaction.__aexit__ = AsyncMock(return_value=False)
+        mock_db.transaction = MagicMock(return_value=transaction)
+        mock_db.fetchrow = AsyncMock(return_value={"id": sample_user_id, "data_version": 0})
+        mock_db.fetch = AsyncMock(return_value=[])
+
+        response = await client.get(
+            "/attempts",
+            headers={"X-Debug-Email": "test@example.com"},
+        )
+
+        assert response.status_code == 200
+        mock_db.transaction.assert_called_once()
+        transaction.__aexit__.assert_awaited_once()
+
 
 class TestStats:
     async def test_stats_requires_auth(self, client):
@@ -223,6 +456,7 @@ class TestStats:
         )
         assert response.status_code == 503
 
+    @pytest.mark.query_budget(max_queries=3)
     async def test_stats_with_mock_db(
         self, client, enable_debug, mock_db, sample_user_id
     ):
@@ -230,8 +464,8 @@ class TestStats:
 
         async def mock_fetchrow_sequence(*args, **kwargs):
             query = args[0] if args else ""
-            if "SELECT id FROM users" in query:
-                return {"id": sample_user_id}
+            if "FROM users WHERE email" in query:
+                return {"id": sample_user_id, "data_version": 0}
             elif "COUNT(*)" in query and "FILTER" in query:
                 return {"total": 10, "correct": 7}
             return None
@@ -256,6 +490,7 @@ class TestStats:
         assert data["accuracy_rate"] == 70.0
         assert len(data["by_category"]) == 2
 
+    @pytest.mark.query_budget(max_queries=3)
     async def test_stats_empty_with_mock_db(
         self, client, enable_debug, mock_db, sample_user_id
     ):
@@ -263,8 +498,8 @@ class TestStats:
 
         async def mock_fetchrow_sequence(*args, **kwargs):
             query = args[0] if args else ""
-            if "SELECT id FROM users" in query:
-                return {"id": sample_user_id}
+            if "FROM users WHERE email" in query:
+                return {"id": sample_user_id, "data_version": 0}
             elif "COUNT(*)" in query:
                 return {"total": 0, "correct": 0}
             return None
@@ -283,3 +518,294 @@ class TestStats:
         assert data["correct_count"] == 0
         assert data["accuracy_rate"] == 0.0
         assert data["by_category"] == []
+
+    @pytest.mark.query_budget(max_queries=3)
+    async def test_stats_includes_cohort_percentile(
+        self, client, enable_debug, mock_db, sample_user_id
+    ):
+        """Stats should rank each category against the cohort histogram."""
+        cohort.load(
+            [
+                {"user_id": user_id, "category": "基礎看護学", "total": total, "correct": correct}
+                for user_id, total, correct in [
+                    (uuid.uuid4(), 10, 2),
+                    (uuid.uuid4(), 10, 5),
+                    (sample_user_id, 5, 4),
+                ]
+            ]
+        )
+
+        async def mock_fetchrow_sequence(*args, **kwargs):
+            query = args[0] if args else ""
+            if "FROM users WHERE email" in query:
+                return {"id": sample_user_id, "data_version": 0}
+            elif "COUNT(*)" in query:
+                return {"total": 5, "correct": 4}
+            return None
+
+        mock_db.fetchrow = AsyncMock(side_effect=mock_fetchrow_sequence)
+        mock_db.fetch = AsyncMock(
+            return_value=[{"category": "基礎看護学", "total": 5, "correct": 4}]
+        )
+
+        response = await client.get(
+            "/stats",
+            headers={"X-Debug-Email": "test@example.com"},
+        )
+
+        assert response.status_code == 200
+        category = response.json()["by_category"][0]
+        assert category["percentile_rank"] == pytest.approx(500 / 6)
+
+
+class TestProgress:
+    async def test_progress_requires_auth(self, client):
+        """Progress endpoint should return 401 without auth."""
+        response = await client.get("/progress")
+        assert response.status_code == 401
+
+    async def test_progress_requires_db(self, client, enable_debug):
+        """Progress should return 503 when DB is not available."""
+        response = await client.get(
+            "/progress",
+            headers={"X-Debug-Email": "test@example.com"},
+        )
+        assert response.status_code == 503
+
+    @pytest.mark.query_budget(max_queries=3)
+    async def test_progress_with_mock_db(
+        self, client, enable_debug, mock_db, sample_user_id
+    ):
+        """Progress should pack latest attempts into cached bitsets."""
+        question_ids = [uuid.uuid4() for _ in range(10)]
+
+        async def mock_fetch(*args, **kwargs):
+            query = args[0] if args else ""
+            if "FROM questions" in query:
+                return [{"id": qid} for qid in question_ids]
+            return [
+                {"question_id": question_ids[0], "is_correct": True},
+                {"question_id": question_ids[3], "is_correct": False},
+                {"question_id": question_ids[9], "is_correct": True},
+            ]
+
+        mock_db.fetchrow = AsyncMock(
+            return_value={"id": sample_user_id, "data_version": 0}
+        )
+        mock_db.fetch = AsyncMock(side_effect=mock_fetch)
+
+        response = await client.get(
+            "/progress",
+            headers={"X-Debug-Email": "test@example.com"},
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["question_count"] == 10
+        assert base64.b64decode(data["answered"]) == bytes([0b00001001, 0b10])
+        assert base64.b64decode(data["correct"]) == bytes([0b00000001, 0b10])
+        assert progress_cache.get((sample_user_id, 0)) is not None
+
+        # A second request is served from the cache.
+        await client.get("/progress", headers={"X-Debug-Email": "test@example.com"})
+        assert mock_db.fetch.await_count == 2
+
+        # A new attempt bumps the data version, so the cached bitmap (even
+        # one stored by a rebuild racing the write) is no longer reachable.
+        mock_db.fetchrow = AsyncMock(
+            return_value={"id": sample_user_id, "data_version": 1}
+        )
+        await client.get("/progress", headers={"X-Debug-Email": "test@example.com"})
+        assert mock_db.fetch.await_count == 3
+
+        index = await client.get(
+            "/progress/index",
+            headers={"X-Debug-Email": "test@example.com"},
+        )
+        assert index.json()["version"] == data["index_version"]
+        assert index.json()["question_ids"] == [str(qid) for qid in question_ids]
+
+        # Polling clients revalidate the index instead of downloading it again.
+        cached = await client.get(
+            "/progress/index",
+            headers={
+                "X-Debug-Email": "test@example.com",
+                "If-None-Match": index.headers["etag"],
+            },
+        )
+        assert cached.status_code == 304
+
+
+class TestConditionalRequests:
+    def mock_user(self, mock_db, user_id, data_version):
+        async def mock_fetchrow_sequence(*args, **kwargs):
+            query = args[0] if args else ""
+            if "FROM users WHERE email" in query:
+                return {"id": user_id, "data_version": data_version}
+            elif "COUNT(*)" in query:
+                return {"total": 1, "correct": 1}
+            return None
+
+        mock_db.fetchrow = AsyncMock(side_effect=mock_fetchrow_sequence)
+        mock_db.fetch = AsyncMock(return_value=[])
+
+    async def test_stats_returns_etag_and_304(
+        self, client, enable_debug, mock_db, sample_user_id
+    ):
+        """A matching If-None-Match should skip the aggregate queries."""
+        self.mock_user(mock_db, sample_user_id, 3)
+        headers = {"X-Debug-Email": "test@example.com"}
+
+        response = await client.get("/stats", headers=headers)
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+
+        mock_db.fetch.reset_mock()
+        response = await client.get(
+            "/stats", headers={**headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        mock_db.fetch.assert_not_awaited()
+
+    async def test_stats_body_cached_per_version(
+        self, client, enable_debug, mock_db, sample_user_id
+    ):
+        """Repeat polls at the same version are served from the cache."""
+        headers = {"X-Debug-Email": "test@example.com"}
+        self.mock_user(mock_db, sample_user_id, 3)
+        first = await client.get("/stats", headers=headers)
+        await client.get("/stats", headers=headers)
+        assert mock_db.fetch.await_count == 1
+
+        # A new attempt bumps the version, which changes the ETag and
+        # forces the queries to run again.
+        self.mock_user(mock_db, sample_user_id, 4)
+        second = await client.get(
+            "/stats",
+            headers={**headers, "If-None-Match": first.headers["etag"]},
+        )
+        assert second.status_code == 200
+        assert second.headers["etag"] != first.headers["etag"]
+        assert mock_db.fetch.await_count == 1
+
+    async def test_attempts_etag_depends_on_params(
+        self, client, enable_debug, mock_db, sample_user_id
+    ):
+        """Different pages of /attempts get different ETags."""
+        self.mock_user(mock_db, sample_user_id, 1)
+        headers = {"X-Debug-Email": "test@example.com"}
+
+        first = await client.get("/attempts", headers=headers)
+        response = await client.get(
+            "/attempts?offset=50",
+            headers={**headers, "If-None-Match": first.headers["etag"]},
+        )
+        assert response.status_code == 200
+        assert response.headers["etag"] != first.headers["etag"]
+
+        response = await client.get(
+            "/attempts", headers={**headers, "If-None-Match": first.headers["etag"]}
+        )
+        assert response.status_code == 304
+
+
+class TestReviewQueue:
+    async def test_review_queue_requires_auth(self, client):
+        """Review queue should return 401 without auth."""
+        response = await client.get("/review/queue")
+        assert response.status_code == 401
+
+    async def test_review_queue_requires_db(self, client, enable_debug):
+        """Review queue should return 503 when DB is not available."""
+        response = await client.get(
+            "/review/queue",
+            headers={"X-Debug-Email": "test@example.com"},
+        )
+        assert response.status_code == 503
+
+    @pytest.mark.query_budget(max_queries=2)
+    async def test_review_queue_with_mock_db(
+        self, client, enable_debug, mock_db, sample_user_id
+    ):
+        """Review queue should put weak categories first."""
+        now = datetime.now(timezone.utc)
+        strong_id, weak_id = uuid.uuid4(), uuid.uuid4()
+        cohort.load(
+            [
+                {"user_id": sample_user_id, "category": "基礎看護学", "total": 10, "correct": 9},
+                {"user_id": sample_user_id, "category": "成人看護学", "total": 10, "correct": 2},
+            ]
+        )
+
+        mock_db.fetchrow = AsyncMock(
+            return_value={"id": sample_user_id, "data_version": 0}
+        )
+        mock_db.fetch = AsyncMock(
+            return_value=[
+                {
+                    "question_id": question_id,
+                    "category": category,
+                    "repetitions": 1,
+                    "interval_days": 1,
+                    "ease_factor": 2.5,
+                    "due_at": now,
+                }
+                for question_id, category in [
+                    (strong_id, "基礎看護学"),
+                    (weak_id, "成人看護学"),
+                ]
+            ]
+        )
+
+        response = await client.get(
+            "/review/queue?limit=1",
+            headers={"X-Debug-Email": "test@example.com"},
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [item["question_id"] for item in data] == [str(weak_id)]
+        assert mock_db.fetch.await_args.args[1:] == (sample_user_id, 3)
+
+
+class TestCohortRefresh:
+    async def test_refresh_failure_is_logged(self, mock_db, caplog, monkeypatch):
+        """A failed cohort refresh should be logged, not silently dropped."""
+        mock_db.fetch = AsyncMock(side_effect=RuntimeError("relation missing"))
+
+        async def stop(delay):
+            raise asyncio.CancelledError
+
+        monkeypatch.setattr(main.asyncio, "sleep", stop)
+
+        with pytest.raises(asyncio.CancelledError):
+            await main.refresh_periodically()
+
+        assert "Failed to refresh cohort histograms" in caplog.text
+        assert "Failed to refresh question index" in caplog.text
+        assert not cohort.loaded
+
+    async def test_refresh_picks_up_new_questions(self, mock_db, monkeypatch):
+        """Questions imported after startup should reach every worker's index."""
+        question_ids = [uuid.uuid4()]
+
+        async def mock_fetch(*args, **kwargs):
+            query = args[0] if args else ""
+            if "FROM questions" in query:
+                return [{"id": qid} for qid in question_ids]
+            return []
+
+        mock_db.fetch = AsyncMock(side_effect=mock_fetch)
+        await question_index.ensure_loaded(mock_db)
+        question_ids.append(uuid.uuid4())
+
+        async def stop(delay):
+            raise asyncio.CancelledError
+
+        monkeypatch.setattr(main.asyncio, "sleep", stop)
+
+        with pytest.raises(asyncio.CancelledError):
+            await main.refresh_periodically()
+
+        assert question_index.question_ids == question_ids
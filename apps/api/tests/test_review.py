@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services import SCHEDULE_REVIEW_SQL, ReviewState, prioritize_due, schedule_review
+
+
+class TestScheduleReview:
+    def test_first_correct_answer(self):
+        state = schedule_review(None, True)
+        assert state.repetitions == 1
+        assert state.interval_days == 1
+        assert state.ease_factor == pytest.approx(2.5)
+
+    def test_intervals_grow_with_ease(self):
+        state = schedule_review(ReviewState(1, 1, 2.5), True)
+        assert state.interval_days == 6
+
+        state = schedule_review(state, True)
+        assert state.repetitions == 3
+        assert state.interval_days == 15
+
+    def test_incorrect_answer_resets_and_lowers_ease(self):
+        state = schedule_review(ReviewState(4, 30, 2.5), False)
+        assert state.repetitions == 0
+        assert state.interval_days == 1
+        assert state.ease_factor == pytest.approx(1.96)
+
+    def test_ease_factor_has_floor(self):
+        state = ReviewState()
+        for _ in range(10):
+            state = schedule_review(state, False)
+        assert state.ease_factor == pytest.approx(1.3)
+
+    def test_sql_update_uses_the_same_ease_changes(self):
+        # Existing schedules are advanced in SQL; keep it in step with Python.
+        correct = schedule_review(ReviewState(2, 6, 2.5), True).ease_factor
+        incorrect = schedule_review(ReviewState(2, 6, 2.5), False).ease_factor
+        assert f"WHEN $4 THEN {correct - 2.5!r}" in SCHEDULE_REVIEW_SQL
+        assert f"ELSE {round(incorrect - 2.5, 10)!r}" in SCHEDULE_REVIEW_SQL
+        assert "GREATEST(\n        1.3," in SCHEDULE_REVIEW_SQL
+
+
+class TestPrioritizeDue:
+    def test_weak_categories_first_then_most_overdue(self):
+        now = datetime.now(timezone.utc)
+        rows = [
+            {"question_id": 1, "category": "基礎看護学", "due_at": now - timedelta(days=5)},
+            {"question_id": 2, "category": "成人看護学", "due_at": now - timedelta(days=1)},
+            {"question_id": 3, "category": "成人看護学", "due_at": now - timedelta(days=2)},
+            {"question_id": 4, "category": "母性看護学", "due_at": now},
+        ]
+        accuracy = {"基礎看護学": 90.0, "成人看護学": 30.0}
+
+        due = prioritize_due(rows, accuracy.get, limit=3)
+
+        # 母性看護学 has no history, so it ranks as 50%.
+        assert [row["question_id"] for row in due] == [3, 2, 4]
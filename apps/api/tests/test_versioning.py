@@ -0,0 +1,27 @@
+from services import VersionedResponseCache, etag_matches, make_etag
+
+
+class TestEtag:
+    def test_make_etag_is_quoted(self):
+        assert make_etag("user", 3) == '"user-3"'
+
+    def test_etag_matches(self):
+        etag = make_etag("user", 3)
+        assert etag_matches(etag, etag)
+        assert etag_matches(f'"other", W/{etag}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches(None, etag)
+        assert not etag_matches(make_etag("user", 2), etag)
+
+
+class TestVersionedResponseCache:
+    def test_evicts_least_recently_used(self):
+        cache = VersionedResponseCache(max_entries=2)
+        cache.set(("stats", "a", 1), "a1")
+        cache.set(("stats", "b", 1), "b1")
+        cache.get(("stats", "a", 1))
+        cache.set(("stats", "c", 1), "c1")
+
+        assert cache.get(("stats", "a", 1)) == "a1"
+        assert cache.get(("stats", "b", 1)) is None
+        assert cache.get(("stats", "c", 1)) == "c1"